@@ -4,9 +4,9 @@ import tempfile
 import shutil
 import zipfile
 from dotenv import load_dotenv
-from preprocess import extract_ifc_data
+from preprocess import extract_many
 from store import store_data_in_chroma
-from chatbot import query_llm
+from chatbot import query_llm, add_known_file_names
 from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
 import torch
 import logging
@@ -21,16 +21,36 @@ load_dotenv()
 HF_TOKEN = os.getenv("HF_TOKEN")
 MODEL_NAME = os.getenv("MODEL_NAME")
 
-# Load tokenizer and model
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, token=HF_TOKEN)
-quant_config = BitsAndBytesConfig(load_in_4bit=True)
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    device_map="auto",
-    quantization_config=quant_config,
-    token=HF_TOKEN
-)
+@st.cache_resource
+def load_llm():
+    """
+    Loads the tokenizer and 4-bit model once per server process, on the first query.
+
+    Loading lazily keeps importing this script cheap: under the spawn start method (Windows,
+    macOS) every extraction worker re-imports it as `__mp_main__`.
+
+    Returns:
+        tuple: The tokenizer, the model, and the device name.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, token=HF_TOKEN)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # bf16 runs on tensor cores from Ampere on; older GPUs fall back to fp16
+    compute_dtype = torch.bfloat16 if device == "cuda" and torch.cuda.is_bf16_supported() else torch.float16
+    quant_config = BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_use_double_quant=True,
+        bnb_4bit_compute_dtype=compute_dtype
+    )
+    model = AutoModelForCausalLM.from_pretrained(
+        MODEL_NAME,
+        device_map="auto",
+        quantization_config=quant_config,
+        torch_dtype=compute_dtype,
+        attn_implementation="sdpa",
+        token=HF_TOKEN
+    )
+    return tokenizer, model, device
 
 # Streamlit app
 st.title("IFC RAG Chatbot")
@@ -54,25 +74,35 @@ if st.button("Preprocess and Store"):
         with zipfile.ZipFile(zip_path, "r") as zip_ref:
             zip_ref.extractall(extracted_folder)
 
-        processed_data = []
-        processed_files = []
-
         # Traverse the extracted folder recursively
-        for root, _, files in os.walk(extracted_folder):
-            for filename in files:
-                if filename.lower().endswith(".ifc"):  # Case-insensitive check
-                    file_path = os.path.join(root, filename)
-                    try:
-                        data = extract_ifc_data(file_path)
-                        processed_data.append(data)
-                        processed_files.append(filename)
-                        logging.info(f"Processed file: {filename}")
-                    except Exception as e:
-                        logging.error(f"Error processing {filename}: {e}")
-                        st.error(f"Error processing {filename}: {e}")
+        ifc_paths = [
+            os.path.join(root, filename)
+            for root, _, files in os.walk(extracted_folder)
+            for filename in files
+            if filename.lower().endswith(".ifc")  # Case-insensitive check
+        ]
+
+        # Parse files in parallel worker processes, updating progress as each one finishes
+        results = {}
+        if ifc_paths:
+            progress = st.progress(0.0, text="Processing IFC files...")
+            for done, (i, data, error) in enumerate(extract_many(ifc_paths), 1):
+                filename = os.path.basename(ifc_paths[i])
+                if error is None:
+                    results[i] = data
+                    logging.info(f"Processed file: {filename}")
+                else:
+                    logging.error(f"Error processing {filename}: {error}")
+                    st.error(f"Error processing {filename}: {error}")
+                progress.progress(done / len(ifc_paths), text=f"Processed {done}/{len(ifc_paths)} IFC files")
+
+        # Keep the folder order regardless of which file finished first
+        processed_data = [results[i] for i in sorted(results)]
+        processed_files = [os.path.basename(ifc_paths[i]) for i in sorted(results)]
 
         if processed_data:
             store_data_in_chroma(processed_data)
+            add_known_file_names(entry.get("file_name") for entry in processed_data)
             st.success(f"Preprocessing and storing complete! Processed {len(processed_files)} files.")
             st.write("Processed files:", processed_files)
 
@@ -110,6 +140,7 @@ if st.button("Submit Query"):
         st.error("Please enter a query.")
     else:
         try:
+            tokenizer, model, device = load_llm()
             answer = query_llm(query, tokenizer, model, device)
             st.write("Answer:", answer)
         except Exception as e:
@@ -1,12 +1,118 @@
-import json
+import orjson
 import chromadb
+from functools import lru_cache
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
 import logging
+import threading
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Longest prompt, in tokens, passed to the model
+MAX_PROMPT_TOKENS = 600
+
+# Stored file names. Replaced, never mutated, so queries in other sessions can iterate it safely
+_known_file_names = None
+_known_file_names_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def get_collection():
+    """
+    Opens the ChromaDB collection once and reuses it for every query.
+
+    Returns:
+        chromadb.Collection: The "ifc_data" collection.
+    """
+    chroma_client = chromadb.PersistentClient(path="chroma_db")
+    return chroma_client.get_or_create_collection(name="ifc_data")
+
+def get_known_file_names():
+    """
+    Loads the file names stored in the collection once; later uploads are added with `add_known_file_names`.
+
+    Returns:
+        frozenset: File names of all stored IFC files.
+    """
+    global _known_file_names
+    with _known_file_names_lock:
+        if _known_file_names is None:
+            metadatas = get_collection().get(include=["metadatas"]).get("metadatas") or []
+            _known_file_names = frozenset(
+                meta.get("file_name") for meta in metadatas if meta and meta.get("file_name")
+            )
+        return _known_file_names
+
+def add_known_file_names(file_names):
+    """
+    Registers newly stored file names so queries can filter on them without rereading the collection.
+
+    Args:
+        file_names (iterable): File names of the IFC files just stored.
+    """
+    global _known_file_names
+    new_names = {name for name in file_names if name}
+    known = get_known_file_names()
+    with _known_file_names_lock:
+        _known_file_names = (_known_file_names or known) | new_names
+
+PROMPT_PIECES = (
+    "Context:\n",
+    "\n\n",
+    "\n\nUser asked: '",
+    "'. Provide ONLY the relevant information based on the stored IFC data.\n\nAI Answer:"
+)
+
+def encode_continuation(tokenizer, text):
+    """
+    Tokenizes text as it is tokenized in the middle of a prompt.
+
+    SentencePiece tokenizers (e.g. Llama, Mistral) prepend a "▁" word boundary to every
+    separately encoded string, which would insert a space before each piece. The text is
+    encoded after a newline anchor instead, and the anchor's ids are dropped.
+
+    Args:
+        tokenizer: The tokenizer for the LLM.
+        text (str): Text that follows other text in the prompt.
+
+    Returns:
+        list: Token ids of the text, without special tokens.
+    """
+    anchor = tokenizer.encode("\n", add_special_tokens=False)
+    ids = tokenizer.encode("\n" + text, add_special_tokens=False)
+    if ids[:len(anchor)] == anchor:
+        return ids[len(anchor):]
+    # The anchor merged with the text (byte-level BPE), which adds no prefix space anyway
+    return tokenizer.encode(text, add_special_tokens=False)
+
+@lru_cache(maxsize=None)
+def get_prompt_ids(tokenizer):
+    """
+    Tokenizes the static pieces of the prompt once per tokenizer.
+
+    Args:
+        tokenizer: The tokenizer for the LLM.
+
+    Returns:
+        tuple: Token ids of the prompt prefix (with the BOS token, if the tokenizer uses one),
+        the separator between documents, the text before the question, and the text after it.
+    """
+    prefix, separator, question, suffix = PROMPT_PIECES
+    bos_id = tokenizer.bos_token_id
+    bos = [bos_id] if bos_id is not None and bos_id in tokenizer.encode("") else []
+    piece_ids = (
+        bos + tokenizer.encode(prefix, add_special_tokens=False),
+        encode_continuation(tokenizer, separator),
+        encode_continuation(tokenizer, question),
+        encode_continuation(tokenizer, suffix)
+    )
+
+    # The pieces must decode back to the text they were encoded from
+    decoded = tokenizer.decode([i for ids in piece_ids for i in ids], skip_special_tokens=True)
+    if decoded != "".join(PROMPT_PIECES):
+        logging.warning(f"Prompt pieces do not round-trip through the tokenizer: {decoded!r}")
+    return piece_ids
+
 def query_llm(query, tokenizer, model, device):
     """
     Queries the LLM with the given query and context from ChromaDB.
@@ -24,43 +130,25 @@ def query_llm(query, tokenizer, model, device):
         Exception: If the query cannot be processed.
     """
     try:
-        chroma_client = chromadb.PersistentClient(path="chroma_db")
-        collection = chroma_client.get_or_create_collection(name="ifc_data")
-
-        def flatten(nested):
-            """
-            Flattens a nested list.
-
-            Args:
-                nested: A nested list.
-
-            Returns:
-                list: A flattened list.
-            """
-            if isinstance(nested, list):
-                flat = []
-                for item in nested:
-                    flat.extend(flatten(item))
-                return flat
-            else:
-                return [nested]
-
-        all_data = collection.get()
-        all_metas = flatten(all_data.get("metadatas", []))
-        where_filter = {}
-        for meta in all_metas:
-            file_name = meta.get("file_name", "").lower()
-            if file_name and file_name in query.lower():
-                where_filter = {"file_name": meta.get("file_name")}
-                break
+        collection = get_collection()
+
+        query_lower = query.lower()
+        # The longest mentioned name wins, so "site.ifc" does not shadow "big-site.ifc"; ties break by name
+        matched = max(
+            (fn for fn in get_known_file_names() if fn.lower() in query_lower),
+            key=lambda fn: (len(fn), fn),
+            default=None
+        )
+        where_filter = {"file_name": matched} if matched else {}
 
         if where_filter:
             search_results = collection.query(query_texts=[query], n_results=3, where=where_filter)
         else:
             search_results = collection.query(query_texts=[query], n_results=3)
 
-        retrieved_docs = flatten(search_results.get("documents", []))
-        retrieved_metadata = flatten(search_results.get("metadatas", []))
+        # query() returns one list per query text
+        retrieved_docs = (search_results.get("documents") or [[]])[0]
+        retrieved_metadata = (search_results.get("metadatas") or [[]])[0]
 
         if not retrieved_docs or not retrieved_metadata:
             return "❌ No relevant IFC data found."
@@ -68,7 +156,7 @@ def query_llm(query, tokenizer, model, device):
         retrieved_contexts = []
         for i, doc in enumerate(retrieved_docs):
             try:
-                doc_data = json.loads(doc)
+                doc_data = orjson.loads(doc)
                 if isinstance(doc_data, list):
                     doc_data = next((d for d in doc_data if isinstance(d, dict)), {})
 
@@ -76,9 +164,10 @@ def query_llm(query, tokenizer, model, device):
                 project_name = meta.get("project_name", doc_data.get("project_name", "Unknown Project"))
                 file_name = meta.get("file_name", doc_data.get("file_name", "Unknown File"))
                 materials = meta.get("materials", ", ".join(doc_data.get("materials", [])))
-                element_counts = meta.get("element_counts", json.dumps(doc_data.get("element_counts", {}), indent=2))
-                spatial_info = meta.get("spatial_info", json.dumps(doc_data.get("spatial_info", {}), indent=2))
-                quantities = meta.get("quantities", json.dumps(doc_data.get("quantities", {}), indent=2))
+                # Fallback JSON is only serialized for keys missing from the metadata
+                element_counts = meta["element_counts"] if "element_counts" in meta else orjson.dumps(doc_data.get("element_counts", {})).decode()
+                spatial_info = meta["spatial_info"] if "spatial_info" in meta else orjson.dumps(doc_data.get("spatial_info", {})).decode()
+                quantities = meta["quantities"] if "quantities" in meta else orjson.dumps(doc_data.get("quantities", {})).decode()
 
                 doc_summary = (
                     f"📂 **Project:** {project_name} ({file_name})\n"
@@ -95,24 +184,36 @@ def query_llm(query, tokenizer, model, device):
         if not retrieved_contexts:
             return "❌ No relevant IFC data found."
 
-        retrieved_context = "\n\n".join(retrieved_contexts)
-        max_context_chars = 1000
-        if len(retrieved_context) > max_context_chars:
-            retrieved_context = retrieved_context[:max_context_chars] + "\n... [truncated]"
-
-        prompt = (
-            f"Context:\n{retrieved_context}\n\n"
-            f"User asked: '{query}'. Provide ONLY the relevant information based on the stored IFC data.\n\n"
-            f"AI Answer:"
-        )
-
-        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=600).to(device)
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=800,
-            temperature=0.7,
-            do_sample=True
-        )
+        # Only the documents and the question are tokenized per query
+        prefix_ids, separator_ids, question_ids, suffix_ids = get_prompt_ids(tokenizer)
+        fixed = (len(prefix_ids) + len(question_ids) + len(suffix_ids)
+                 + len(separator_ids) * (len(retrieved_contexts) - 1))
+        # An overlong question is cut short so the instructions and the answer cue always fit
+        query_ids = encode_continuation(tokenizer, query)[:max(0, MAX_PROMPT_TOKENS - fixed)]
+
+        # Split the tokens left after the instructions and the question evenly between the
+        # documents, so no document crowds out the others
+        budget = max(0, (MAX_PROMPT_TOKENS - fixed - len(query_ids)) // len(retrieved_contexts))
+        context_ids = []
+        for i, summary in enumerate(retrieved_contexts):
+            if i:
+                context_ids.extend(separator_ids)
+            context_ids.extend(encode_continuation(tokenizer, summary)[:budget])
+
+        input_ids = (prefix_ids + context_ids + question_ids + query_ids + suffix_ids)[:MAX_PROMPT_TOKENS]
+        input_ids = torch.tensor([input_ids], device=device)
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+        # Greedy decoding without autograd bookkeeping; stop at EOS or when the model starts a new turn
+        with torch.inference_mode():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=800,
+                do_sample=False,
+                eos_token_id=tokenizer.eos_token_id,
+                pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+                stop_strings=["\n\nUser:"],
+                tokenizer=tokenizer
+            )
 
         return tokenizer.decode(outputs[0], skip_special_tokens=True)
     except Exception as e:
@@ -1,16 +1,60 @@
 import os
 import json
+import tempfile
 import ifcopenshell
 import logging
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from hashlib import blake2b
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Extraction results are cached by file content; bump the version when the output layout changes
+CACHE_DIR = os.getenv("IFC_CACHE_DIR", "ifc_cache")
+CACHE_VERSION = 2
+
+def get_cache_path(ifc_file_path):
+    """
+    Returns the cache file path for an IFC file, keyed by a hash of its content.
+
+    Args:
+        ifc_file_path (str): Path to the IFC file.
+
+    Returns:
+        str: Path of the JSON cache entry for this file's content.
+    """
+    h = blake2b(digest_size=16)
+    with open(ifc_file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return os.path.join(CACHE_DIR, f"{h.hexdigest()}-v{CACHE_VERSION}.json")
+
+def write_cache(cache_path, data):
+    """
+    Atomically writes extracted data to the cache, so readers never see a partial entry.
+
+    Args:
+        cache_path (str): Path of the cache entry.
+        data (dict): The extracted data.
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, cache_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
 def extract_ifc_data(ifc_file_path):
     """
     Extracts data from an IFC file and returns a structured dictionary.
 
+    Results are cached in `CACHE_DIR` by file content, so unchanged files are only parsed once.
+
     Args:
         ifc_file_path (str): Path to the IFC file.
 
@@ -26,37 +70,91 @@ def extract_ifc_data(ifc_file_path):
         file_size = os.path.getsize(ifc_file_path) / (1024 * 1024)  # Size in MB
         logging.info(f"Processing file: {ifc_file_path} (Size: {file_size:.2f} MB)")
 
-        ifc_file = ifcopenshell.open(ifc_file_path)
+        cache_path = get_cache_path(ifc_file_path)
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                data = json.load(f)
+            data["file_name"] = os.path.basename(ifc_file_path)
+            logging.info(f"Loaded cached data for {ifc_file_path}")
+            return data
 
-        # Extract project name
-        project_name = ifc_file.by_type("IfcProject")[0].Name if ifc_file.by_type("IfcProject") else "Unknown Project"
+        ifc_file = ifcopenshell.open(ifc_file_path)
 
-        # Count entities
-        entity_counts = {}
+        # Index entities by their exact type in a single pass over the file
+        entities_by_type = defaultdict(list)
         for entity in ifc_file:
-            entity_name = entity.is_a()
-            entity_counts[entity_name] = entity_counts.get(entity_name, 0) + 1
+            entities_by_type[entity.is_a()].append(entity)
+        entity_counts = {name: len(entities) for name, entities in entities_by_type.items()}
+
+        type_cache = {}
+
+        def by_type(type_name):
+            """
+            Returns all entities of the given type, including its subtypes, from the single-pass index.
+
+            Entities are sorted by id, matching the order of `ifc_file.by_type`.
+
+            Args:
+                type_name (str): The IFC type name (e.g., "IfcWall").
+
+            Returns:
+                list: The matching entities.
+            """
+            if type_name not in type_cache:
+                type_cache[type_name] = sorted(
+                    (
+                        entity
+                        for entities in entities_by_type.values()
+                        if entities[0].is_a(type_name)
+                        for entity in entities
+                    ),
+                    key=lambda entity: entity.id()
+                )
+            return type_cache[type_name]
+
+        # Extract project name
+        projects = by_type("IfcProject")
+        project_name = projects[0].Name if projects else "Unknown Project"
 
         # Extract materials
-        materials = {mat.Name for mat in ifc_file.by_type("IfcMaterial")}
+        materials = {mat.Name for mat in by_type("IfcMaterial")}
 
         # Extract spatial structure
-        sites = [site.Name for site in ifc_file.by_type("IfcSite")]
-        buildings = [bld.Name for bld in ifc_file.by_type("IfcBuilding")]
-        stories = [story.Name for story in ifc_file.by_type("IfcBuildingStorey")]
+        sites = [site.Name for site in by_type("IfcSite")]
+        buildings = [bld.Name for bld in by_type("IfcBuilding")]
+        stories = [story.Name for story in by_type("IfcBuildingStorey")]
 
         # Extract element counts
         element_counts = {
-            "walls": len(ifc_file.by_type("IfcWall")),
-            "slabs": len(ifc_file.by_type("IfcSlab")),
-            "roofs": len(ifc_file.by_type("IfcRoof")),
-            "columns": len(ifc_file.by_type("IfcColumn")),
-            "beams": len(ifc_file.by_type("IfcBeam")),
-            "windows": len(ifc_file.by_type("IfcWindow")),
-            "doors": len(ifc_file.by_type("IfcDoor")),
+            "walls": len(by_type("IfcWall")),
+            "slabs": len(by_type("IfcSlab")),
+            "roofs": len(by_type("IfcRoof")),
+            "columns": len(by_type("IfcColumn")),
+            "beams": len(by_type("IfcBeam")),
+            "windows": len(by_type("IfcWindow")),
+            "doors": len(by_type("IfcDoor")),
         }
 
-        # Helper function to extract quantities for an element type
+        # Collect element quantities in a single pass over the property relationships,
+        # instead of walking the inverse relationships of every element per quantity
+        quantity_map = defaultdict(lambda: defaultdict(float))
+        for rel in by_type("IfcRelDefinesByProperties"):
+            prop_set = rel.RelatingPropertyDefinition
+            if not prop_set.is_a("IfcElementQuantity"):
+                continue
+            totals = defaultdict(float)
+            for quantity in prop_set.Quantities:
+                if quantity.is_a("IfcQuantityArea"):
+                    totals["IfcQuantityArea"] += quantity.AreaValue or 0
+                elif quantity.is_a("IfcQuantityVolume"):
+                    totals["IfcQuantityVolume"] += quantity.VolumeValue or 0
+            if not totals:
+                continue
+            for obj in rel.RelatedObjects:
+                element_quantities = quantity_map[obj.id()]
+                for quantity_type, value in totals.items():
+                    element_quantities[quantity_type] += value
+
         def get_element_quantities(element_type, quantity_type):
             """
             Calculates the total quantity (area or volume) for a given element type.
@@ -68,17 +166,11 @@ def extract_ifc_data(ifc_file_path):
             Returns:
                 float: The total quantity value.
             """
-            total_value = 0
-            for element in ifc_file.by_type(element_type):
-                rels = ifc_file.get_inverse(element)
-                for rel in rels:
-                    if rel.is_a("IfcRelDefinesByProperties"):
-                        prop_set = rel.RelatingPropertyDefinition
-                        if prop_set.is_a("IfcElementQuantity"):
-                            for quantity in prop_set.Quantities:
-                                if quantity.is_a(quantity_type):
-                                    total_value += getattr(quantity, "AreaValue", 0) if quantity_type == "IfcQuantityArea" else getattr(quantity, "VolumeValue", 0)
-            return total_value
+            return sum(
+                quantity_map[element.id()][quantity_type]
+                for element in by_type(element_type)
+                if element.id() in quantity_map
+            )
 
         # Calculate quantities
         total_wall_area = get_element_quantities("IfcWall", "IfcQuantityArea")
@@ -90,7 +182,7 @@ def extract_ifc_data(ifc_file_path):
         processing_time = (datetime.now() - start_time).total_seconds()
         logging.info(f"Finished processing {ifc_file_path} in {processing_time:.2f} seconds")
 
-        return {
+        data = {
             "file_name": os.path.basename(ifc_file_path),
             "project_name": project_name,
             "materials": list(materials),
@@ -108,6 +200,34 @@ def extract_ifc_data(ifc_file_path):
                 "total_concrete_volume_m3": total_concrete_volume,
             }
         }
+
+        try:
+            write_cache(cache_path, data)
+        except OSError as e:
+            logging.warning(f"Could not cache data for {ifc_file_path}: {e}")
+
+        return data
     except Exception as e:
         logging.error(f"Error extracting data from {ifc_file_path}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def extract_many(ifc_file_paths, workers=None):
+    """
+    Extracts data from several IFC files in parallel worker processes.
+
+    Results are yielded as soon as each file is done, so callers can report progress.
+
+    Args:
+        ifc_file_paths (list): Paths to the IFC files.
+        workers (int, optional): Number of worker processes. Defaults to the CPU count.
+
+    Yields:
+        tuple: `(index, data, error)` for each file, in completion order. `index` is the file's
+        position in `ifc_file_paths`; `error` is the exception raised while processing it, in
+        which case `data` is None.
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(extract_ifc_data, path): i for i, path in enumerate(ifc_file_paths)}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (future.result() if error is None else None), error
@@ -1,5 +1,6 @@
-import json
+import orjson
 import chromadb
+from functools import lru_cache
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 import logging
@@ -7,6 +8,24 @@ import logging
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+@lru_cache(maxsize=None)
+def get_vector_db():
+    """
+    Loads the embedding model and opens the Chroma vector store once, reusing them across uploads.
+
+    Returns:
+        Chroma: The "ifc_data" vector store.
+    """
+    embedding_model = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        encode_kwargs={"batch_size": 64}
+    )
+    return Chroma(
+        collection_name="ifc_data",
+        persist_directory="chroma_db",
+        embedding_function=embedding_model
+    )
+
 def store_data_in_chroma(processed_data):
     """
     Stores processed IFC data in ChromaDB.
@@ -18,20 +37,17 @@ def store_data_in_chroma(processed_data):
         Exception: If data cannot be stored in ChromaDB.
     """
     try:
-        embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        vector_db = Chroma(
-            collection_name="ifc_data",
-            persist_directory="chroma_db",
-            embedding_function=embedding_model
-        )
+        vector_db = get_vector_db()
 
+        texts, metadatas = [], []
         for entry in processed_data:
             project_name = entry.get("project_name", "Unknown Project")
             file_name = entry.get("file_name", "Unknown File")
             materials = ", ".join(entry.get("materials", []))
-            spatial_info = json.dumps(entry.get("spatial_info", {}))
-            element_counts = json.dumps(entry.get("element_counts", {}))
-            quantities = json.dumps(entry.get("quantities", {}))
+            # orjson writes compact JSON straight to bytes; Chroma stores str
+            spatial_info = orjson.dumps(entry.get("spatial_info", {})).decode()
+            element_counts = orjson.dumps(entry.get("element_counts", {})).decode()
+            quantities = orjson.dumps(entry.get("quantities", {})).decode()
 
             metadata = {
                 "project_name": project_name,
@@ -42,10 +58,13 @@ def store_data_in_chroma(processed_data):
                 "quantities": quantities,
             }
 
-            doc_text = json.dumps(entry)
-            vector_db.add_texts(texts=[doc_text], metadatas=[metadata])
-            logging.info(f"✅ Stored: {file_name} -> Project: {project_name}")
+            texts.append(orjson.dumps(entry).decode())
+            metadatas.append(metadata)
+            logging.info(f"✅ Prepared: {file_name} -> Project: {project_name}")
 
+        # Embed and insert all entries in one batch instead of one call per file
+        if texts:
+            vector_db.add_texts(texts=texts, metadatas=metadatas)
         logging.info("IFC data successfully stored in ChromaDB!")
     except Exception as e:
         logging.error(f"Error storing data: {e}")
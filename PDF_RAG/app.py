@@ -13,8 +13,9 @@ Logging and error handling are added for robustness.
 
 import gradio as gr
 from utils.pdf_utils import process_uploaded_files
-from utils.rag_utils import rag_chat, clear_documents
+from utils.rag_utils import rag_chat, clear_documents, warm_up_model
 from utils.logger import get_logger
+from config import CFG
 
 logger = get_logger(__name__)
 
@@ -94,19 +95,26 @@ def create_interface():
                     logger.error("Error in clear_documents: %s", e, exc_info=True)
                     return f"Error clearing documents: {e}"
 
-            def safe_rag_chat(message, history):
+            async def safe_rag_chat(message, history):
                 try:
-                    return rag_chat(message, history)
+                    # Each yielded history re-renders the chatbot, so answers appear as they stream
+                    async for updated in rag_chat(message, history):
+                        yield updated
                 except Exception as e:
                     logger.error("Error in rag_chat: %s", e, exc_info=True)
                     # Return history with an error message
                     history.append({"role":"assistant", "content":f"Error: {e}"})
-                    return history
-
-            btn_process.click(safe_process, [upload], [status])
-            btn_cleardoc.click(safe_clear_docs, [], [status])
-            btn_send.click(safe_rag_chat, [msg, chatbot], [chatbot]).then(lambda: "", None, [msg])
-            msg.submit(safe_rag_chat, [msg, chatbot], [chatbot]).then(lambda: "", None, [msg])
+                    yield history
+
+            # Processing and clearing modify the shared indices, so they share one queue that
+            # runs a single call at a time; chats share another that lets several await the
+            # model at once
+            docs_queue = {"concurrency_limit": 1, "concurrency_id": "documents"}
+            btn_process.click(safe_process, [upload], [status], **docs_queue)
+            btn_cleardoc.click(safe_clear_docs, [], [status], **docs_queue)
+            chat_queue = {"concurrency_limit": CFG.chat_concurrency, "concurrency_id": "chat"}
+            btn_send.click(safe_rag_chat, [msg, chatbot], [chatbot], **chat_queue).then(lambda: "", None, [msg])
+            msg.submit(safe_rag_chat, [msg, chatbot], [chatbot], **chat_queue).then(lambda: "", None, [msg])
             btn_clr.click(lambda: [], None, [chatbot])
 
             gr.Markdown("""
@@ -128,6 +136,7 @@ def create_interface():
 if __name__ == "__main__":
     try:
         demo = create_interface()
+        warm_up_model()
         demo.launch(share=False)
     except Exception as e:
         logger.critical("Application failed to start: %s", e, exc_info=True)
@@ -3,25 +3,63 @@ Configuration module for environment variables and application constants.
 
 This module sets default values for all major settings used in the RAG system,
 including chunking parameters, retrieval weights, chat settings, and Ollama model parameters.
-These can be overridden using environment variables at runtime.
+These can be overridden using environment variables, which are read once at import time
+into the frozen `CFG` object. Functions take a `cfg: Config = CFG` argument, so a different
+configuration can be passed explicitly instead of re-importing this module.
 """
 
 import os
+from dataclasses import dataclass
 
-# === PDF Chunking Settings ===
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 500))          # Max tokens per chunk
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 100))    # Overlap between chunks for context preservation
+@dataclass(frozen=True, slots=True)
+class Config:
+    # === PDF Chunking Settings ===
+    chunk_size: int = 500                   # Max tokens per chunk
+    chunk_overlap: int = 100                # Overlap between chunks for context preservation
+    pdf_extract_workers: int = min(4, os.cpu_count() or 1)  # Processes used for pdfplumber page extraction
+    pdf_parallel_min_pages: int = 32        # Smaller PDFs are extracted in-process by pdfplumber
+    pdf_in_memory_max_bytes: int = 32 << 20 # Larger PDFs are hashed and parsed from disk instead of read into memory
 
-# === Retrieval Settings ===
-TOP_K = int(os.getenv("TOP_K", 3))                      # Number of top results to retrieve
-SPARSE_WEIGHT = float(os.getenv("SPARSE_WEIGHT", 0.3))  # Weight for BM25-based sparse retriever
-DENSE_WEIGHT = float(os.getenv("DENSE_WEIGHT", 0.7))    # Weight for TF-IDF dense retriever
+    # === Retrieval Settings ===
+    top_k: int = 3                          # Number of top results to retrieve
+    sparse_weight: float = 0.3              # Weight for BM25-based sparse retriever
+    dense_weight: float = 0.7               # Weight for TF-IDF dense retriever
 
-# === Chat Settings ===
-MAX_EXCHANGES = int(os.getenv("MAX_EXCHANGES", 5))      # Number of recent Q&A pairs retained in chat history
+    # === Dense Index Settings ===
+    dense_backend: str = "tfidf"            # "tfidf" (linear scan) or "faiss" (HNSW over sentence embeddings)
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"  # Embedder for the faiss backend
+    hnsw_m: int = 32                        # Neighbours per node in the HNSW graph
+    embedding_dtype: str = "int8"           # Vector storage in the HNSW index: "int8" (scalar-quantized) or "float32"
 
-# === Ollama LLM Configuration ===
-OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "gemma3")              # LLM model name (e.g., llama2, gemma3)
-OLLAMA_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", 0.7))  # Controls randomness of output
-OLLAMA_TOP_P = float(os.getenv("OLLAMA_TOP_P", 0.9))              # Top-p sampling cutoff
-OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", 4096))           # Maximum context window size
+    # === Knowledge Graph Settings ===
+    ner_batch_size: int = 64                # Chunks per spaCy batch during KG construction
+    ner_n_process: int = max(1, (os.cpu_count() or 2) // 2)  # spaCy worker processes for NER
+
+    # === Chat Settings ===
+    max_exchanges: int = 5                  # Number of recent Q&A pairs retained in chat history
+    chat_concurrency: int = 4               # Chat requests handled concurrently by the Gradio queue
+
+    # === Ollama LLM Configuration ===
+    ollama_host: str = "http://localhost:11434"  # Ollama server URL
+    ollama_timeout: float = 120.0           # Seconds to wait on the Ollama server before giving up
+    ollama_model: str = "gemma3"            # LLM model name (e.g., llama2, gemma3)
+    ollama_temperature: float = 0.7         # Controls randomness of output
+    ollama_top_p: float = 0.9               # Top-p sampling cutoff
+    ollama_num_ctx: int = 4096              # Maximum context window size
+    ollama_keep_alive: str = "24h"          # How long the model stays loaded after a request ("-1m" = forever)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a Config from environment variables named after the upper-cased fields
+        (e.g. `TOP_K`), using the defaults above for any that are unset.
+        """
+        defaults = cls()
+        values = {}
+        for name in cls.__dataclass_fields__:
+            raw = os.getenv(name.upper())
+            if raw is not None:
+                values[name] = type(getattr(defaults, name))(raw)
+        return cls(**values)
+
+CFG = Config.from_env()
@@ -1,7 +1,9 @@
 from dotenv import load_dotenv
 from app import create_interface
+from utils.rag_utils import warm_up_model
 
 if __name__ == "__main__":
     load_dotenv()
     demo = create_interface()
+    warm_up_model()
     demo.launch(share=False)
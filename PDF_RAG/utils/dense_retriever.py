@@ -2,22 +2,130 @@
 Dense retriever module using TF-IDF and cosine similarity.
 
 Builds and queries a dense vector index over all document chunks stored in the application state.
+The index is updated incrementally: only chunks added since the last update are tokenized or embedded.
+
+When `dense_backend` is set to "faiss" and both faiss and sentence-transformers are installed, chunks are
+embedded with a sentence-transformers model and searched through a FAISS HNSW index instead of a linear
+TF-IDF scan, with the vectors stored as int8 unless `embedding_dtype` is "float32". If those libraries are
+unavailable, the TF-IDF index is used.
 """
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from config import Config, CFG
 from utils.state import state
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def update_dense_index():
+try:
+    import faiss
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    faiss = None
+    SentenceTransformer = None
+
+try:
+    from sparse_dot_topn import sp_matmul_topn
+except ImportError:
+    sp_matmul_topn = None
+
+# Stateless term counter: new chunks can be tokenized without refitting a vocabulary.
+# float32 halves the bytes streamed per query compared to the float64 default.
+_hasher = HashingVectorizer(stop_words="english", alternate_sign=False, norm=None, dtype=np.float32)
+
+_embedder = None
+
+def _embed(texts, model_name=None):
+    """
+    Encode texts into L2-normalized float32 embeddings, loading the embedding model on first use.
+
+    Args:
+        texts (List[str]): Texts to encode.
+        model_name (str, optional): sentence-transformers model to encode with. Defaults to the
+                                    model that was loaded last, i.e. the one the index was built with.
+
+    Returns:
+        np.ndarray: Array of shape (len(texts), dim) with dtype float32.
+    """
+    global _embedder
+    if model_name is not None and (_embedder is None or _embedder[0] != model_name):
+        _embedder = (model_name, SentenceTransformer(model_name))
+        logger.info("Loaded embedding model '%s'.", model_name)
+    embeddings = _embedder[1].encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+def _new_faiss_index(dim, cfg):
+    """
+    Create an empty HNSW index over inner product for embeddings of the given dimension.
+
+    With `embedding_dtype` "int8", vectors are stored 8-bit scalar-quantized, which cuts the bytes
+    read per distance computation to a quarter. Normalized embeddings lie in [-1, 1], so the quantizer
+    is trained on that fixed range rather than on the first batch, and later batches are never clipped.
+    """
+    if cfg.embedding_dtype == "int8":
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit_uniform, cfg.hnsw_m,
+                                  faiss.METRIC_INNER_PRODUCT)
+        index.train(np.array([[-1.0] * dim, [1.0] * dim], dtype=np.float32))
+        return index
+    return faiss.IndexHNSWFlat(dim, cfg.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+
+def _update_faiss_index(cfg):
+    """
+    Embed chunks added since the last update and append them to the FAISS HNSW index.
+
+    Inner product over normalized embeddings is used as the metric, which is equivalent to cosine similarity.
+    FAISS does not allow adding to an index while it is being searched, and chats search concurrently
+    with uploads, so the new embeddings are added to a copy that then replaces the live index.
+    """
+    start = state.dense_index.ntotal if state.dense_index is not None else 0
+    new_chunks = state.all_chunks[start:]
+    if not new_chunks:
+        return
+    embeddings = _embed(new_chunks, cfg.embedding_model)
+    if state.dense_index is None:
+        index = _new_faiss_index(embeddings.shape[1], cfg)
+    else:
+        index = faiss.clone_index(state.dense_index)
+    index.add(embeddings)
+    state.dense_index = index
+    state.vectorizer = None
+    state.chunk_counts = None
+    state.chunk_embeddings = None
+
+def _update_tfidf_index():
+    """
+    Count terms of chunks added since the last update and recompute the TF-IDF weights.
+
+    Term counts are appended to `state.chunk_counts`; only the IDF reweighting, a vectorized pass
+    over the stored counts, touches the whole corpus. The weighted embeddings are stored term-major
+    (terms x chunks), so scoring a query only reads the rows of the terms it contains.
+    """
+    start = state.chunk_counts.shape[0] if state.chunk_counts is not None else 0
+    new_chunks = state.all_chunks[start:]
+    if new_chunks:
+        new_counts = _hasher.transform(new_chunks)
+        if state.chunk_counts is None:
+            state.chunk_counts = new_counts
+        else:
+            state.chunk_counts = sp.vstack([state.chunk_counts, new_counts], format="csr")
+    # TfidfTransformer L2-normalizes rows, so cosine similarity reduces to a sparse dot product
+    state.vectorizer = TfidfTransformer(norm="l2").fit(state.chunk_counts)
+    state.chunk_embeddings = state.vectorizer.transform(state.chunk_counts).T.tocsr()
+    state.dense_index = None
+
+def update_dense_index(cfg: Config = CFG):
     """
-    Builds a TF-IDF vector index for all text chunks in the application state.
+    Updates the TF-IDF vector index with any new text chunks in the application state.
 
-    This function initializes a TfidfVectorizer with English stop words and fits it to the list of all
-    text chunks stored in the application's state. The resulting vectorizer and the transformed chunk
-    embeddings are stored back into the state for future retrieval operations.
+    Chunks added since the last update are turned into term counts with a stateless HashingVectorizer
+    (English stop words removed) and appended to the stored counts. The IDF weights are then refitted
+    over all counts, and the resulting L2-normalized float32 embeddings are stored back into the state,
+    as a term-major CSR matrix, for future retrieval operations, so cosine similarity reduces to a
+    sparse dot product.
+
+    With the "faiss" backend, new chunks are embedded and added to a FAISS HNSW index instead.
 
     Returns:
         None
@@ -26,42 +134,84 @@ def update_dense_index():
         if not state.all_chunks:
             logger.warning("update_dense_index called with no chunks in state.")
             return
-        state.vectorizer = TfidfVectorizer(stop_words="english")
-        state.chunk_embeddings = state.vectorizer.fit_transform(state.all_chunks)
-        logger.info("Dense index built with %d chunks.", len(state.all_chunks))
+        if cfg.dense_backend == "faiss":
+            if faiss is not None:
+                _update_faiss_index(cfg)
+                logger.info("FAISS HNSW index holds %d chunks.", state.dense_index.ntotal)
+                return
+            logger.warning("faiss or sentence-transformers not installed; falling back to TF-IDF.")
+        _update_tfidf_index()
+        logger.info("Dense index holds %d chunks.", state.chunk_embeddings.shape[1])
     except Exception as e:
         logger.error("Failed to build dense index: %s", e, exc_info=True)
         # Clean up partial state
         state.vectorizer = None
+        state.chunk_counts = None
         state.chunk_embeddings = None
+        state.dense_index = None
 
-def retrieve_dense(query, top_k):
+def search_dense(query, top_k):
     """
-    Retrieves the top_k most relevant text chunks to the given query using cosine similarity.
+    Finds the indices of the top_k chunks most similar to the given query using cosine similarity.
 
-    This function transforms the input query into a TF-IDF vector using the pre-fitted vectorizer from the
-    application state. It then computes the cosine similarity between the query vector and all stored
-    chunk embeddings, returning the top_k chunks with the highest similarity scores.
+    This function transforms the input query into a TF-IDF vector using the hashing vectorizer and the
+    fitted IDF weights from the application state. It then computes the cosine similarity between the
+    query vector and the stored chunk embeddings as a single sparse product, which only touches chunks
+    sharing a term with the query, and selects the top_k of those. When sparse_dot_topn is installed,
+    the product and top-k selection are fused so the full score row is never materialized; otherwise
+    `np.argpartition` is used so only the selected candidates are sorted. Chunks with zero similarity
+    are not returned.
+
+    If a FAISS index is available, the query is embedded and searched approximately through the index.
 
     Args:
         query (str): The input query string to search for relevant chunks.
         top_k (int): The number of top similar chunks to retrieve.
 
     Returns:
-        List[Tuple[str, str]]: A list of tuples, each containing a text chunk and a string indicating its source index.
-                               Returns an empty list on error or if the index is unavailable.
+        np.ndarray: Chunk indices into `state.all_chunks`, most similar first.
+                    Empty on error or if the index is unavailable.
     """
-    if state.vectorizer is None or state.chunk_embeddings is None:
+    if state.dense_index is None and (state.vectorizer is None or state.chunk_embeddings is None):
         logger.warning("retrieve_dense called but dense index is not available.")
-        return []
+        return np.empty(0, dtype=np.int64)
 
     try:
-        qv = state.vectorizer.transform([query])
-        sims = cosine_similarity(qv, state.chunk_embeddings).flatten()
-        idxs = sims.argsort()[-top_k:][::-1]
-        results = [(state.all_chunks[i], f"Source idx={i}") for i in idxs]
-        logger.info("retrieve_dense for query '%s' returned %d hits.", query, len(results))
-        return results
+        if state.dense_index is not None:
+            _, found = state.dense_index.search(_embed([query]), top_k)
+            idxs = found[0][found[0] >= 0]
+        else:
+            qv = state.vectorizer.transform(_hasher.transform([query])).tocsr()
+            if sp_matmul_topn is not None:
+                top = sp_matmul_topn(qv, state.chunk_embeddings, top_n=top_k, sort=True)
+                idxs = top.indices[top.data > 0].astype(np.int64)
+            else:
+                sims = qv @ state.chunk_embeddings
+                hit_idxs, hit_sims = sims.indices, sims.data
+                k = min(top_k, hit_sims.shape[0])
+                if k <= 0:
+                    return np.empty(0, dtype=np.int64)
+                order = np.argpartition(-hit_sims, k - 1)[:k]
+                idxs = hit_idxs[order[np.argsort(-hit_sims[order])]].astype(np.int64)
+        logger.debug("retrieve_dense for query '%s' returned %d hits.", query, len(idxs))
+        return idxs
     except Exception as e:
         logger.error("Dense retrieval error for query '%s': %s", query, e, exc_info=True)
-        return []
+        return np.empty(0, dtype=np.int64)
+
+def retrieve_dense(query, top_k):
+    """
+    Retrieves the top_k most relevant text chunks to the given query using cosine similarity.
+
+    See `search_dense` for how chunks are ranked.
+
+    Args:
+        query (str): The input query string to search for relevant chunks.
+        top_k (int): The number of top similar chunks to retrieve.
+
+    Returns:
+        List[Tuple[str, str]]: A list of tuples, each containing a text chunk and its source (file name and page).
+                               Returns an empty list on error or if the index is unavailable.
+    """
+    idxs = search_dense(query, top_k)
+    return list(zip((state.all_chunks[i] for i in idxs), state.chunk_sources(idxs)))
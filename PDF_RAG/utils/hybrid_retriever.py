@@ -2,53 +2,119 @@
 Hybrid retriever module.
 
 Performs a combined sparse (BM25) and dense (TF-IDF) retrieval to rank document chunks.
+Results are memoized per query until the indices change.
 """
 
-from .sparse_retriever import retrieve_sparse
-from .dense_retriever import retrieve_dense
-from config import TOP_K, SPARSE_WEIGHT, DENSE_WEIGHT
+from functools import lru_cache
+import numpy as np
+from .sparse_retriever import search_sparse
+from .dense_retriever import search_dense
+from config import Config, CFG
+from utils.state import state
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def retrieve_hybrid(query):
+try:
+    from numba import njit
+except ImportError:
+    # Fallback if numba is unavailable: run the kernel as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Compiled eagerly for this signature at import, so no query pays the JIT compile
+@njit("Tuple((int64[:], float64[:]))(int64[:], int64[:], float64, float64, int64)", cache=True)
+def _fuse_ranks(sparse_ids, dense_ids, sparse_weight, dense_weight, n_candidates):
+    """
+    Sum the weighted rank scores of each candidate chunk id.
+
+    A hit at rank r contributes `weight * (n_candidates - r)`. Ids are merged by sorting the
+    concatenated candidates, so the work is O(m log m) in the number of candidates and
+    independent of the corpus size.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Unique chunk ids (ascending) and their fused scores.
+    """
+    n_sparse = sparse_ids.shape[0]
+    m = n_sparse + dense_ids.shape[0]
+    ids = np.empty(m, np.int64)
+    weights = np.empty(m, np.float64)
+    for i in range(n_sparse):
+        ids[i] = sparse_ids[i]
+        weights[i] = sparse_weight * (n_candidates - i)
+    for i in range(m - n_sparse):
+        ids[n_sparse + i] = dense_ids[i]
+        weights[n_sparse + i] = dense_weight * (n_candidates - i)
+
+    order = np.argsort(ids, kind="mergesort")
+    fused_ids = np.empty(m, np.int64)
+    fused_scores = np.zeros(m, np.float64)
+    count = 0
+    for j in range(m):
+        chunk_id = ids[order[j]]
+        if count == 0 or fused_ids[count - 1] != chunk_id:
+            fused_ids[count] = chunk_id
+            count += 1
+        fused_scores[count - 1] += weights[order[j]]
+    return fused_ids[:count], fused_scores[:count]
+
+@lru_cache(maxsize=512)
+def _retrieve_hybrid_cached(query, index_version, cfg):
+    """
+    Rank chunks for a query against a given version of the indices.
+
+    `index_version` is only part of the cache key: it changes whenever documents are added
+    or cleared, so stale results are never served. `cfg` is part of the key as well, since
+    it sets the number of results and the weights.
+
+    Returns:
+        Tuple[Tuple[str, str], ...]: Texts and sources of the top-ranked chunks, best first.
+    """
+    # Retrieve extended candidates
+    n_candidates = cfg.top_k * 2
+    sparse_ids = search_sparse(query, n_candidates)
+    dense_ids  = search_dense(query, n_candidates)
+    logger.debug("Hybrid retrieval: got %d sparse hits and %d dense hits for query '%s'.",
+                 len(sparse_ids), len(dense_ids), query)
+
+    # Combine rank scores per chunk id
+    chunk_ids, scores = _fuse_ranks(sparse_ids.astype(np.int64), dense_ids.astype(np.int64),
+                                    cfg.sparse_weight, cfg.dense_weight, n_candidates)
+    if chunk_ids.size == 0:
+        return ()
+
+    # Select top_k
+    k = min(cfg.top_k, len(chunk_ids))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    ids = chunk_ids[best]
+    return tuple(zip((state.all_chunks[i] for i in ids), state.chunk_sources(ids)))
+
+def retrieve_hybrid(query, cfg: Config = CFG):
     """
     Performs hybrid retrieval of relevant text chunks based on a combination of sparse and dense methods.
 
     This function retrieves candidate chunks using both sparse (e.g., BM25) and dense (e.g., TF-IDF or embeddings) methods.
     Each chunk is assigned a weighted score based on its rank in each retrieval type. The final list of top-ranked
-    chunks is determined by combining these scores, giving a hybrid approach to ranking.
+    chunks is determined by combining these scores, giving a hybrid approach to ranking. Rankings are cached for
+    repeated queries until the indices are updated.
 
-    The weights and number of results are controlled by global config variables:
-    - `TOP_K`: number of final results to return
-    - `SPARSE_WEIGHT`: contribution of the sparse retriever to the final score
-    - `DENSE_WEIGHT`: contribution of the dense retriever to the final score
+    The weights and number of results are controlled by the config:
+    - `top_k`: number of final results to return
+    - `sparse_weight`: contribution of the sparse retriever to the final score
+    - `dense_weight`: contribution of the dense retriever to the final score
 
     Args:
         query (str): The user's query to search relevant chunks for.
+        cfg (Config, optional): Retrieval settings. Defaults to `CFG`.
 
     Returns:
-        List[Tuple[str, str]]: A list of top-ranked text chunks as tuples with an empty source string.
+        List[Tuple[str, str]]: A list of top-ranked text chunks as tuples with their source (file name and page).
                                Returns an empty list on error.
     """
     try:
-        # Retrieve extended candidates
-        sparse_hits = retrieve_sparse(query, TOP_K * 2)
-        dense_hits  = retrieve_dense(query, TOP_K * 2)
-        logger.info("Hybrid retrieval: got %d sparse hits and %d dense hits for query '%s'.",
-                    len(sparse_hits), len(dense_hits), query)
-
-        # Combine scores
-        scores = {}
-        for rank, (chunk, _) in enumerate(sparse_hits):
-            scores[chunk] = SPARSE_WEIGHT * (TOP_K * 2 - rank)
-        for rank, (chunk, _) in enumerate(dense_hits):
-            scores[chunk] = scores.get(chunk, 0) + DENSE_WEIGHT * (TOP_K * 2 - rank)
-
-        # Select top_k
-        best = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:TOP_K]
-        results = [(chunk, "") for chunk, _ in best]
-        logger.info("Hybrid retrieval: returning %d top results for query '%s'.", len(results), query)
+        results = list(_retrieve_hybrid_cached(query, state.index_version, cfg))
+        logger.debug("Hybrid retrieval: returning %d top results for query '%s'.", len(results), query)
         return results
 
     except Exception as e:
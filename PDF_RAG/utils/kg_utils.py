@@ -9,6 +9,7 @@ Functions:
 If required NLP or RDF libraries are unavailable, fallback no-op implementations are used.
 """
 
+from config import Config, CFG
 from utils.state import state
 from utils.logger import get_logger
 
@@ -28,15 +29,18 @@ try:
 
     kg = Graph()
 
-    def build_kg():
+    def build_kg(cfg: Config = CFG):
         """
         Constructs a knowledge graph (KG) from named entities found in processed document chunks.
 
-        This function uses spaCy's NER to extract entities from each document chunk and populates
-        an RDFLib graph with triples of the form:
+        This function runs spaCy's NER over all document chunks in batches (with the parser, tagger
+        and lemmatizer disabled, since only entities are needed) and populates an RDFLib graph
+        with triples of the form:
             (entity_text, has_label, entity_type)
 
-        The graph is stored in `state.kg` for later querying.
+        The graph is stored in `state.kg` for offline analysis. Alongside the graph, each entity text
+        is mapped to its labels in `state.kg_subject_to_labels`, which is what queries consult, so
+        lookups are plain hash lookups instead of RDF triple-pattern matches.
 
         Dependencies:
             - Requires spaCy with the 'en_core_web_sm' model.
@@ -47,11 +51,19 @@ try:
         """
         try:
             kg.remove((None, None, None))
-            for h, doc in state.processed_documents.items():
-                for chunk in doc["chunks"]:
-                    doc_nlp = nlp(chunk)
-                    for ent in doc_nlp.ents:
-                        kg.add((URIRef(ent.text), URIRef("has_label"), Literal(ent.label_)))
+            state.kg_subject_to_labels.clear()
+            all_chunks = [c for doc in state.processed_documents.values() for c in doc["chunks"]]
+            for doc_nlp in nlp.pipe(
+                all_chunks,
+                batch_size=cfg.ner_batch_size,
+                n_process=cfg.ner_n_process,
+                disable=["parser", "lemmatizer", "tagger"]
+            ):
+                for ent in doc_nlp.ents:
+                    kg.add((URIRef(ent.text), URIRef("has_label"), Literal(ent.label_)))
+                    labels = state.kg_subject_to_labels.setdefault(ent.text, [])
+                    if ent.label_ not in labels:
+                        labels.append(ent.label_)
             state.kg = kg
             logger.info("Knowledge graph built with %d triples.", len(kg))
         except Exception as e:
@@ -62,7 +74,8 @@ try:
         Queries the knowledge graph for any entities mentioned in the user's question.
 
         For each token in the question, this function checks if it exists as a subject in the graph.
-        If found, it retrieves and returns all associated object values (typically entity types).
+        If found, it returns all associated object values (typically entity types). Only the
+        in-memory subject index is consulted; RDFLib is not used on the query path.
 
         Args:
             question (str): The user's natural language question.
@@ -75,20 +88,20 @@ try:
             logger.warning("query_kg called but state.kg is None.")
             return None
         try:
-            for token in question.split():
-                subj = URIRef(token)
-                if (subj, None, None) in kg:
-                    objs = [str(o) for o in kg.objects(subj, None)]
-                    result = ", ".join(objs)
-                    logger.info("query_kg found %d objects for token '%s'.", len(objs), token)
-                    return result
+            lookup = state.kg_subject_to_labels
+            token = next((t for t in question.split() if t in lookup), None)
+            if token is not None:
+                objs = lookup[token]
+                result = ", ".join(objs)
+                logger.info("query_kg found %d objects for token '%s'.", len(objs), token)
+                return result
         except Exception as e:
             logger.error("Error querying knowledge graph for '%s': %s", question, e, exc_info=True)
         return None
 
 except (ImportError, OSError):
     # Fallback if spaCy or RDFLib is unavailable
-    def build_kg():
+    def build_kg(cfg: Config = CFG):
         """Fallback no-op if KG dependencies are missing."""
         logger.warning("build_kg no-op: KG dependencies unavailable.")
 
@@ -1,16 +1,39 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 
+# Records are queued by the calling thread and written to stdout and app.log
+# by a background listener, so logging never blocks on console or disk I/O.
+_log_queue = queue.Queue(-1)
+_listener  = logging.handlers.QueueListener(
+    _log_queue,
+    logging.StreamHandler(sys.stdout),
+    logging.FileHandler("app.log", encoding="utf-8")
+)
+_listener.start()
+atexit.register(_listener.stop)
+
 # Configure root logger
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s:%(name)s: %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("app.log", encoding="utf-8")
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 
+def init_worker_logging():
+    """
+    Log straight to stdout in a forked worker process.
+
+    Workers inherit the queue handler, but not the listener thread that drains the queue,
+    so without this their records would be silently lost.
+    """
+    root = logging.getLogger()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s:%(name)s: %(message)s"))
+    root.handlers = [handler]
+
 def get_logger(name: str):
     """Return a named logger."""
     return logging.getLogger(name)
@@ -2,8 +2,8 @@
 PDF Processing Module
 
 This module handles:
-- Copying uploaded PDF files to the local `static/` directory
-- Extracting and chunking text from each PDF using pdfplumber and LangChain's text splitter
+- Linking (or copying) uploaded PDF files into the local `static/` directory
+- Extracting and chunking text from each PDF using PyMuPDF (pdfplumber as fallback) and LangChain's text splitter
 - Maintaining chunk-to-document mapping for retrieval
 - Updating dense (TF-IDF) and sparse (BM25) retrieval indices
 - Logging processing statuses and returning user-readable summaries
@@ -11,26 +11,206 @@ This module handles:
 Used in the context of a Hybrid RAG (Retrieval-Augmented Generation) application.
 """
 
+import io
 import os
 import shutil
+import numpy as np
 import pdfplumber
-from hashlib import md5
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from hashlib import blake2b
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import Config, CFG
 from utils.state import state
-from utils.logger import get_logger
+from utils.logger import get_logger, init_worker_logging
 from .dense_retriever import update_dense_index
 from .sparse_retriever import update_bm25_index
 
 logger = get_logger(__name__)
 
-def process_uploaded_files(files):
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24.3
+    except ImportError:
+        fitz = None
+
+HASH_BLOCK_SIZE = 1 << 20  # Read files in 1 MiB blocks when hashing
+
+def file_digest(path):
+    """
+    Compute a content hash of a file without loading it into memory at once.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex-encoded 128-bit BLAKE2b digest of the file contents.
+    """
+    h = blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def read_with_digest(path):
+    """
+    Read a file once, returning both its content hash and its bytes.
+
+    The digest matches `file_digest`, so the bytes can be parsed without a second read.
+    Only meant for files small enough to hold in memory; see `pdf_in_memory_max_bytes`.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        Tuple[str, bytes]: Hex-encoded 128-bit BLAKE2b digest and the file contents.
+    """
+    with open(path, "rb") as fh:
+        data = fh.read()
+    return blake2b(data, digest_size=16).hexdigest(), data
+
+def publish_to_static(orig_path, static_path, file_hash):
+    """
+    Make an uploaded PDF available at `static_path` without copying its bytes when possible.
+
+    An existing file with the same content is kept as-is. Otherwise the upload is hard-linked
+    into place, falling back to a copy when the filesystem does not support hard links (e.g.
+    across devices). Symlinks are not used because uploads live in temporary files that may
+    be removed after the request.
+
+    Args:
+        orig_path (str): Path of the uploaded PDF.
+        static_path (str): Destination path under `static/`.
+        file_hash (str): Content hash of the upload, as returned by `file_digest`.
+    """
+    if os.path.exists(static_path):
+        if os.path.samefile(orig_path, static_path) or file_digest(static_path) == file_hash:
+            return
+        os.remove(static_path)
+    try:
+        os.link(orig_path, static_path)
+    except OSError:
+        shutil.copy(orig_path, static_path)
+
+@lru_cache(maxsize=8)
+def get_splitter(chunk_size, chunk_overlap):
+    """
+    Return a shared text splitter for the given chunking parameters.
+
+    The splitter is built once per parameter pair and reused across pages and files.
+
+    Args:
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared between consecutive chunks.
+
+    Returns:
+        RecursiveCharacterTextSplitter: The splitter.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len
+    )
+
+def _extract_page_range(path, start, stop):
+    """
+    Extract the text of pages [start, stop) of a PDF with pdfplumber.
+
+    Runs inside worker processes, so the PDF is opened here rather than passed in
+    (pdfplumber objects cannot be pickled).
+
+    Args:
+        path (str): Path to the PDF.
+        start (int): Index of the first page.
+        stop (int): Index one past the last page.
+
+    Returns:
+        List[str]: Text of each page, empty for pages without extractable text.
+    """
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def extract_pages(path, data, cfg: Config = CFG):
+    """
+    Extract the text of every page of a PDF, in page order.
+
+    Text is extracted in-process with PyMuPDF, which is fast enough that a process pool would
+    only add start-up cost. pdfplumber is used if PyMuPDF is not installed or cannot open the
+    document; being much slower, it splits PDFs with at least `cfg.pdf_parallel_min_pages` pages
+    into contiguous page ranges extracted by up to `cfg.pdf_extract_workers` worker processes,
+    which reopen the file from `path` (it is normally still in the OS page cache).
+
+    PDFs are parsed straight from `data` when the file was read into memory and from `path`
+    otherwise.
+
+    Args:
+        path (str): Path to the PDF.
+        data (bytes or None): The already-read contents of the PDF, or None if it was not read
+                              into memory.
+        cfg (Config, optional): Extraction settings. Defaults to `CFG`.
+
+    Returns:
+        List[str]: Text of each page.
+    """
+    if fitz is not None:
+        try:
+            with (fitz.open(path) if data is None else fitz.open(stream=data, filetype="pdf")) as doc:
+                return [page.get_text("text") for page in doc]
+        except Exception as e:
+            logger.warning("PyMuPDF failed on %s, falling back to pdfplumber: %s", path, e)
+
+    with pdfplumber.open(path if data is None else io.BytesIO(data)) as pdf:
+        n_pages = len(pdf.pages)
+        if cfg.pdf_extract_workers <= 1 or n_pages < cfg.pdf_parallel_min_pages:
+            return [page.extract_text() or "" for page in pdf.pages]
+
+    workers = min(cfg.pdf_extract_workers, n_pages)
+    step = -(-n_pages // workers)
+    starts = range(0, n_pages, step)
+    stops = [min(start + step, n_pages) for start in starts]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker_logging) as executor:
+        parts = executor.map(_extract_page_range, repeat(path), starts, stops)
+        return [text for part in parts for text in part]
+
+def map_chunks_to_doc(start, stop, file_hash, file_name, pages):
+    """
+    Record that chunks [start, stop) belong to the document with the given hash.
+
+    Documents get consecutive integer ids (indices into `state.doc_hashes` and
+    `state.doc_names`), and each chunk's doc id and page index are stored in the int32
+    arrays `state.chunk_doc_ids` and `state.chunk_pages`, whose capacity is doubled as
+    needed so appends are amortized O(1). The hash of chunk `i` is
+    `state.doc_hashes[state.chunk_doc_ids[i]]`.
+
+    Args:
+        start (int): Index of the document's first chunk in `state.all_chunks`.
+        stop (int): Index one past its last chunk.
+        file_hash (str): Content hash of the document.
+        file_name (str): File name of the document.
+        pages (List[int]): Page index of each of the document's chunks.
+    """
+    doc_id = len(state.doc_hashes)
+    state.doc_hashes.append(file_hash)
+    state.doc_names.append(file_name)
+    if stop > state.chunk_doc_ids.shape[0]:
+        capacity = max(stop, 2 * state.chunk_doc_ids.shape[0], 1024)
+        for name in ("chunk_doc_ids", "chunk_pages"):
+            grown = np.empty(capacity, dtype=np.int32)
+            grown[:start] = getattr(state, name)[:start]
+            setattr(state, name, grown)
+    state.chunk_doc_ids[start:stop] = doc_id
+    state.chunk_pages[start:stop] = pages
+
+def process_uploaded_files(files, cfg: Config = CFG):
     """
     Processes uploaded PDF files:
-    - Copies each PDF into `static/` for serving
+    - Links each new PDF into `static/` for serving
     - Safely extracts text page-by-page, skipping corrupted/unreadable PDFs
     - Splits text into chunks with page tracking
-    - Rebuilds dense and sparse indices
+    - Updates dense and sparse indices with the new chunks
     - Returns detailed per-file status messages for the UI
     """
     if not files:
@@ -46,22 +226,15 @@ def process_uploaded_files(files):
         filename    = os.path.basename(orig_path)
         static_path = os.path.join("static", filename)
 
-        # 1) Copy PDF to static for serving
-        try:
-            shutil.copy(orig_path, static_path)
-            logger.info("Copied PDF %s to static folder.", filename)
-        except Exception as e:
-            msg = f"❌ Failed to copy {filename}: {e}"
-            logger.error(msg, exc_info=True)
-            messages.append(msg)
-            continue
-
-        # 2) Compute document hash
+        # 1) Compute document hash; small PDFs are read once and parsed from memory,
+        #    large ones are hashed in blocks and parsed from disk
         try:
-            with open(orig_path, "rb") as fh:
-                file_hash = md5(fh.read()).hexdigest()
+            if os.path.getsize(orig_path) <= cfg.pdf_in_memory_max_bytes:
+                file_hash, data = read_with_digest(orig_path)
+            else:
+                file_hash, data = file_digest(orig_path), None
         except Exception as e:
-            msg = f"❌ Failed to hash {filename}: {e}"
+            msg = f"❌ Failed to read {filename}: {e}"
             logger.error(msg, exc_info=True)
             messages.append(msg)
             continue
@@ -72,13 +245,19 @@ def process_uploaded_files(files):
             messages.append(msg)
             continue
 
+        # 2) Link PDF into static for serving
+        try:
+            publish_to_static(orig_path, static_path, file_hash)
+            logger.info("Published PDF %s to static folder.", filename)
+        except Exception as e:
+            msg = f"❌ Failed to copy {filename}: {e}"
+            logger.error(msg, exc_info=True)
+            messages.append(msg)
+            continue
+
         # 3) Extract text, skip any read errors
         try:
-            text = ""
-            with pdfplumber.open(orig_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text() or ""
-                    text += page_text + "\f"
+            pages = extract_pages(orig_path, data, cfg)
             logger.info("Extracted text from %s", filename)
         except Exception as e:
             msg = f"⚠️ Skipping unreadable PDF {filename}: {e}"
@@ -88,14 +267,9 @@ def process_uploaded_files(files):
 
         # 4) Chunk text with page tracking
         try:
-            pages        = text.split("\f")
             all_chunks   = []
             page_indices = []
-            splitter     = RecursiveCharacterTextSplitter(
-                chunk_size=CHUNK_SIZE,
-                chunk_overlap=CHUNK_OVERLAP,
-                length_function=len
-            )
+            splitter     = get_splitter(cfg.chunk_size, cfg.chunk_overlap)
             for pi, pg in enumerate(pages):
                 chunks = splitter.split_text(pg)
                 all_chunks.extend(chunks)
@@ -116,8 +290,7 @@ def process_uploaded_files(files):
             }
             start_idx = len(state.all_chunks)
             state.all_chunks.extend(all_chunks)
-            for idx in range(start_idx, len(state.all_chunks)):
-                state.chunk_to_doc_map[idx] = file_hash
+            map_chunks_to_doc(start_idx, len(state.all_chunks), file_hash, filename, page_indices)
             processed_count += 1
             msg = f"✅ Processed {filename} ({len(all_chunks)} chunks)"
             logger.info(msg)
@@ -128,10 +301,11 @@ def process_uploaded_files(files):
             messages.append(msg)
             continue
 
-    # 6) Rebuild retrieval indices
+    # 6) Update retrieval indices with the new chunks
     try:
-        update_dense_index()
+        update_dense_index(cfg)
         update_bm25_index()
+        state.index_version += 1
         summary = f"🏁 Done: {processed_count} new docs, {len(state.all_chunks)} total chunks"
         logger.info(summary)
         messages.append(summary)
@@ -6,33 +6,53 @@ Features:
 - Knowledge Graph (KG) entity lookup.
 - Substring-based fallback for technical queries (e.g., formulas).
 - Hybrid retrieval using sparse and dense methods.
-- Text generation using Ollama.
+- Streamed text generation using Ollama.
 - Document and index clearing functionality.
 
 Dependencies:
-- ollama: for language model inference.
+- ollama: for language model inference, through a shared AsyncClient.
+- asyncio: to keep retrieval and generation off the event loop so chats overlap.
 - datetime: for timestamp formatting.
 - utils.state: global in-memory state.
 - config: model and generation parameters.
 - utils.logger: centralized logging.
 """
 
+import asyncio
+import heapq
 import ollama
 import os
+import numpy as np
+from collections.abc import AsyncIterator
 from datetime import datetime
+from itertools import groupby, islice
 from utils.state       import state
 from utils.logger      import get_logger
 from .hybrid_retriever import retrieve_hybrid
 from .kg_utils         import query_kg
-from config            import (
-    OLLAMA_MODEL,
-    OLLAMA_TEMPERATURE,
-    OLLAMA_TOP_P,
-    OLLAMA_NUM_CTX
-)
+from .sparse_retriever import KEY_TERMS_LOWER
+from config            import Config, CFG
 
 logger = get_logger(__name__)
 
+# One client for the whole process, so its HTTP connection pool is reused across chats
+_client = ollama.AsyncClient(host=CFG.ollama_host, timeout=CFG.ollama_timeout)
+
+# Static parts of the prompt; only the references and the question vary per call
+_PROMPT_HEAD = """<s>[INST] <<SYS>>
+    You are an articulate AI assistant that provides:
+    1. Contextually precise answers using ONLY the provided references
+    2. Well-structured responses 
+    If context is insufficient, respond: "The provided references don't contain relevant information."
+
+    References:
+    """
+_PROMPT_MIDDLE = """
+    <</SYS>>
+
+    Question: """
+_PROMPT_TAIL = " [/INST]"
+
 def _now():
     """Return current timestamp as a formatted string."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -52,52 +72,47 @@ def _format_message(role: str, content: str) -> dict:
     markdown = f"{content}\n\n*_{ts}_*"
     return {"role": role, "content": markdown}
 
-def generate_response(query: str, chunks: list[tuple[str,str]]) -> str:
+async def generate_response(query: str, chunks: list[tuple[str,str]], cfg: Config = CFG) -> AsyncIterator[str]:
     """
     Use the Ollama language model to generate a response based on retrieved document chunks.
 
+    The response is streamed from the shared AsyncClient, so responses for several chats can be
+    generated concurrently (see `OLLAMA_NUM_PARALLEL` in the README) and shown as they are written.
+
     Args:
         query (str): User's question.
         chunks (list of tuple): Context chunks and their sources.
+        cfg (Config, optional): Model and generation settings. Defaults to `CFG`.
 
-    Returns:
-        str: Assistant's generated response or error message.
+    Yields:
+        str: Successive pieces of the assistant's response, or an error message.
     """
-    prompt = """<s>[INST] <<SYS>>
-    You are an articulate AI assistant that provides:
-    1. Contextually precise answers using ONLY the provided references
-    2. Well-structured responses 
-    If context is insufficient, respond: "The provided references don't contain relevant information."
-
-    References:
-    {context}
-    <</SYS>>
-
-    Question: {query} [/INST]""".format(
-            context="\n\n".join(f"---\nContent: {c}\nSource: {s}" for c, s in chunks),
-            query=query
-        )
+    context = "\n\n".join(f"---\nContent: {c}\nSource: {s}" for c, s in chunks)
+    prompt = f"{_PROMPT_HEAD}{context}{_PROMPT_MIDDLE}{query}{_PROMPT_TAIL}"
 
     try:
-        resp = ollama.generate(
-            model=OLLAMA_MODEL,
+        stream = await _client.generate(
+            model=cfg.ollama_model,
             prompt=prompt,
+            stream=True,
+            keep_alive=cfg.ollama_keep_alive,
             options={
-                "temperature": OLLAMA_TEMPERATURE,
-                "top_p":       OLLAMA_TOP_P,
-                "num_ctx":     OLLAMA_NUM_CTX
+                "temperature": cfg.ollama_temperature,
+                "top_p":       cfg.ollama_top_p,
+                "num_ctx":     cfg.ollama_num_ctx
             }
         )
+        async for part in stream:
+            yield part["response"]
         logger.info("Ollama response generated for query: %s", query)
-        return resp["response"].strip()
     except Exception as e:
         logger.error("Error generating response for query '%s': %s", query, e, exc_info=True)
-        return f"Error generating response: {e}"
+        yield f"Error generating response: {e}"
 
 def substring_fallback(query: str) -> list[tuple[str,str]] | None:
     """
     If key technical terms (e.g., formulas) are detected in the query,
-    return matching chunks directly as fallback.
+    return the first chunks containing any of those terms directly as fallback.
 
     Args:
         query (str): User's question.
@@ -105,22 +120,22 @@ def substring_fallback(query: str) -> list[tuple[str,str]] | None:
     Returns:
         Optional[List[Tuple[str, str]]]: Matched context chunks or None if no match.
     """
-    key_terms = ["PE(", "positional encoding", "sin(", "cos("]
     try:
-        if any(term.lower() in query.lower() for term in key_terms):
-            matches = []
-            for chunk in state.all_chunks:
-                if any(term in chunk for term in key_terms):
-                    matches.append((chunk, ""))
-                    if len(matches) >= state.max_chat_history:
-                        break
+        q = query.lower()
+        hit_terms = [term for term in KEY_TERMS_LOWER if term in q]
+        if hit_terms:
+            # Merge the ascending postings of the terms in the query, dropping repeated
+            # ids, and stop after the first N: no chunk is scanned here
+            merged = heapq.merge(*(state.keyterm_postings.get(term, ()) for term in hit_terms))
+            ids = list(islice((i for i, _ in groupby(merged)), state.max_chat_history))
+            matches = list(zip((state.all_chunks[i] for i in ids), state.chunk_sources(ids)))
             logger.info("Substring fallback triggered for query: %s, %d matches", query, len(matches))
             return matches
     except Exception as e:
         logger.error("Error in substring_fallback for '%s': %s", query, e, exc_info=True)
     return None
 
-def rag_chat(message: str, history: list[dict]) -> list[dict]:
+async def rag_chat(message: str, history: list[dict]) -> AsyncIterator[list[dict]]:
     """
     Main entry point for RAG-based chat interaction.
 
@@ -129,43 +144,53 @@ def rag_chat(message: str, history: list[dict]) -> list[dict]:
     2. Attempt Knowledge Graph lookup.
     3. If no KG result, try formula substring fallback.
     4. Otherwise, use hybrid retrieval.
-    5. Generate and append assistant response.
+    5. Generate and append assistant response, updating it as it streams in.
     6. Trim history to the most recent N exchanges.
 
+    Retrieval runs in a worker thread and generation is awaited, so other chats
+    are served while this one waits on the model.
+
     Args:
         message (str): User's chat input.
         history (list of dict): Chat history, each message as a dict.
 
-    Returns:
-        list of dict: Updated chat history.
+    Yields:
+        list of dict: Updated chat history, once per streamed piece of the response.
     """
     try:
         if not message.strip():
-            return history
-    
+            yield history
+            return
+
         # 1) Append user message
         history.append(_format_message("user", message))
         logger.debug("User message appended: %s", message)
+        yield history
 
         # 2) KG lookup
-        kg_ans = query_kg(message)
+        kg_ans = await asyncio.to_thread(query_kg, message)
         if kg_ans:
             history.append(_format_message("assistant", f"KG Lookup: {kg_ans}"))
             logger.info("KG lookup success for query: %s", message)
         else:
             # 3) Substring fallback for formulas
-            fb = substring_fallback(message)
+            fb = await asyncio.to_thread(substring_fallback, message)
             if fb is not None:
                 chunks = fb
                 logger.debug("Using substring fallback chunks.")
             else:
                 # 4) Hybrid sparse + dense retrieval
-                chunks = retrieve_hybrid(message)
+                chunks = await asyncio.to_thread(retrieve_hybrid, message)
                 logger.debug("Using hybrid retrieval, %d chunks retrieved.", len(chunks))
 
-            # 5) Generate the assistant answer
-            answer = generate_response(message, chunks)
-            history.append(_format_message("assistant", answer))
+            # 5) Stream the assistant answer, timestamping it once complete
+            answer = ""
+            history.append({"role": "assistant", "content": answer})
+            async for piece in generate_response(message, chunks):
+                answer += piece
+                history[-1] = {"role": "assistant", "content": answer}
+                yield history
+            history[-1] = _format_message("assistant", answer.strip())
             logger.info("Assistant response appended.")
 
         # 6) Trim to last N exchanges (2 messages per exchange)
@@ -179,7 +204,24 @@ def rag_chat(message: str, history: list[dict]) -> list[dict]:
         # Ensure the user still sees an error message
         history.append(_format_message("assistant", f"An error occurred: {e}"))
 
-    return history
+    yield history
+
+def warm_up_model(cfg: Config = CFG) -> None:
+    """
+    Load the Ollama model ahead of the first chat and keep it loaded for `ollama_keep_alive`.
+
+    An empty prompt makes Ollama load the model without generating anything. A blocking
+    one-off request is used, since this runs once at startup, before the event loop.
+
+    Args:
+        cfg (Config, optional): Model settings. Defaults to `CFG`.
+    """
+    try:
+        client = ollama.Client(host=cfg.ollama_host, timeout=cfg.ollama_timeout)
+        client.generate(model=cfg.ollama_model, prompt="", keep_alive=cfg.ollama_keep_alive)
+        logger.info("Ollama model '%s' loaded.", cfg.ollama_model)
+    except Exception as e:
+        logger.warning("Could not warm up Ollama model '%s': %s", cfg.ollama_model, e)
 
 def clear_documents() -> str:
     """
@@ -192,12 +234,21 @@ def clear_documents() -> str:
     try:
         state.processed_documents.clear()
         state.all_chunks.clear()
-        state.chunk_to_doc_map.clear()
+        state.doc_hashes.clear()
+        state.doc_names.clear()
+        state.chunk_doc_ids    = np.empty(0, dtype=np.int32)
+        state.chunk_pages      = np.empty(0, dtype=np.int32)
         state.vectorizer       = None
+        state.chunk_counts     = None
         state.chunk_embeddings = None
+        state.dense_index      = None
+        state.chunk_tokens.clear()
+        state.keyterm_postings.clear()
         state.bm25_index       = None
+        state.index_version   += 1
         if hasattr(state, "kg"):
             state.kg = None
+        state.kg_subject_to_labels.clear()
         logger.info("Cleared all documents and indices from state.")
         return "All documents cleared."
     except Exception as e:
@@ -1,104 +1,154 @@
 """
-Sparse retriever module using Whoosh and BM25.
+Sparse retriever module using bm25s and BM25.
 
 This script builds and queries a BM25-based index over all document chunks
-stored in the application state. The index is rebuilt from scratch each time
-new documents are processed.
+stored in the application state. Scoring is done by bm25s as sparse-matrix
+operations instead of a per-document Python loop. Chunks are tokenized once,
+when they are first indexed, and the index is rebuilt from the cached tokens.
 
 Main Functions:
-- update_bm25_index: Builds and stores a Whoosh index for sparse retrieval.
+- update_bm25_index: Builds and stores a bm25s index for sparse retrieval.
+- search_sparse: Returns the indices of the top-k chunks for a query.
 - retrieve_sparse: Retrieves top-k relevant chunks from the index for a query.
 
 Dependencies:
-- Whoosh: full-text indexing and BM25 ranking
+- bm25s: vectorized BM25 indexing and ranking (numba-accelerated if installed)
+- PyStemmer: English stemming of chunks and queries
 - utils.state: shared in-memory state holding chunk data
 - utils.logger: centralized logging
 """
-import os
-import shutil
-from whoosh import index, fields, writing, qparser
-from whoosh.analysis import StemmingAnalyzer
+import re
+import bm25s
+import numpy as np
+import Stemmer
+from bm25s.stopwords import STOPWORDS_EN
 from utils.state import state
 from utils.logger import get_logger
-from config import TOP_K
+from config import CFG
 
 logger = get_logger(__name__)
 
+_stemmer = Stemmer.Stemmer("english")
+
+# Formula terms that send a query to the substring fallback instead of ranked retrieval.
+# Chunks are matched case-sensitively, queries case-insensitively.
+KEY_TERMS = ("PE(", "positional encoding", "sin(", "cos(")
+KEY_TERMS_LOWER = tuple(term.lower() for term in KEY_TERMS)
+
+def _tokenize(texts):
+    """
+    Tokenize texts into lists of stemmed, stop-word-filtered tokens.
+
+    Args:
+        texts (List[str]): Texts to tokenize.
+
+    Returns:
+        List[List[str]]: Tokens of each text.
+    """
+    return bm25s.tokenize(texts, stopwords="en", stemmer=_stemmer,
+                          return_ids=False, show_progress=False)
+
+# Same pattern and stop words as `bm25s.tokenize`, built once instead of on every query
+_split_words = re.compile(r"(?u)\b\w\w+\b").findall
+_stopwords = frozenset(STOPWORDS_EN)
+
+def _tokenize_query(query):
+    """
+    Tokenize a single query the way `_tokenize` tokenizes chunks, without bm25s' per-call setup.
+
+    Args:
+        query (str): Query to tokenize.
+
+    Returns:
+        List[str]: Stemmed, stop-word-filtered tokens of the query.
+    """
+    return _stemmer.stemWords([w for w in _split_words(query.lower()) if w not in _stopwords])
+
 def update_bm25_index():
     """
-    Create or rebuild a BM25 index over all text chunks using Whoosh.
+    Create or rebuild a BM25 index over all text chunks using bm25s.
 
     Steps:
-    1. Removes the old index directory (if any).
-    2. Defines a schema with stemming for better search matching.
-    3. Adds all document chunks from the global state.
-    4. Stores the index back to global state.
+    1. Tokenizes only the chunks added since the last update and caches
+       their tokens in global state, adding them to the postings of the key terms they contain.
+    2. Builds a bm25s index over the cached tokens of all chunks.
+    3. Stores the index back to global state.
 
     Returns:
         None
     """
-    index_dir = "bm25_index"
     try:
-        # 1) Remove old index to pick up schema changes
-        if os.path.exists(index_dir):
-            shutil.rmtree(index_dir)
-            logger.debug("Deleted existing BM25 index directory.")
-        os.makedirs(index_dir, exist_ok=True)
-        logger.debug("Created BM25 index directory: %s", index_dir)
-
-        # 2) Define schema with content stored
-        schema = fields.Schema(
-            id=fields.NUMERIC(stored=True),
-            content=fields.TEXT(stored=True, analyzer=StemmingAnalyzer())
-        )
-
-        # 3) Create new index
-        idx = index.create_in(index_dir, schema)
-        logger.info("Created new Whoosh BM25 index in %s", index_dir)
-
-        # 4) Add documents
-        writer = idx.writer()
-        writer.mergetype = writing.CLEAR
-        for i, chunk in enumerate(state.all_chunks):
-            writer.add_document(id=i, content=chunk)
-        writer.commit()
-        logger.info("Indexed %d chunks into BM25 index.", len(state.all_chunks))
-
-        # 5) Save to state
-        state.bm25_index = idx
+        # 1) Tokenize new chunks
+        start = len(state.chunk_tokens)
+        if start < len(state.all_chunks):
+            new_chunks = state.all_chunks[start:]
+            state.chunk_tokens.extend(_tokenize(new_chunks))
+            for term, term_lower in zip(KEY_TERMS, KEY_TERMS_LOWER):
+                state.keyterm_postings.setdefault(term_lower, []).extend(
+                    i for i, chunk in enumerate(new_chunks, start) if term in chunk
+                )
+        logger.debug("Tokenized %d new chunks for BM25.", len(state.chunk_tokens) - start)
+
+        # 2) Build index
+        # "auto" scores with bm25s' numba kernels when numba is installed, numpy otherwise
+        retriever = bm25s.BM25(backend="auto")
+        retriever.index(state.chunk_tokens, show_progress=False)
+        logger.info("Indexed %d chunks into BM25 index.", len(state.chunk_tokens))
+
+        # 3) Save to state
+        state.bm25_index = retriever
         logger.info("BM25 index updated in application state.")
 
     except Exception as e:
         logger.error("Failed to update BM25 index: %s", e, exc_info=True)
+        state.bm25_index = None
 
 
-def retrieve_sparse(query, top_k=TOP_K):
+def search_sparse(query, top_k=CFG.top_k):
     """
-    Perform sparse retrieval using BM25 over the indexed document chunks.
+    Find the indices of the top-k chunks matching a query using BM25.
 
     Args:
         query (str): User input query.
-        top_k (int, optional): Number of top results to retrieve. Defaults to TOP_K.
+        top_k (int, optional): Number of top results to retrieve. Defaults to `CFG.top_k`.
 
     Returns:
-        List[Tuple[str, str]]: A list of tuples containing matched text chunks
-                               and their source indices. Returns an empty list
-                               on error or if index is unavailable.
+        np.ndarray: Indices into `state.all_chunks` of chunks with a positive
+                    BM25 score, best first. Empty on error or if the index
+                    is unavailable.
     """
     if state.bm25_index is None:
         logger.warning("retrieve_sparse called but bm25_index is None.")
-        return []
+        return np.empty(0, dtype=np.int64)
 
     try:
-        idx = state.bm25_index
-        qp = qparser.QueryParser("content", schema=idx.schema)
-        q  = qp.parse(query)
-        with idx.searcher() as searcher:
-            results = searcher.search(q, limit=top_k)
-            hits = [(hit["content"], f"Source idx={hit['id']}") for hit in results]
-            logger.info("retrieve_sparse for query '%s' returned %d hits.", query, len(hits))
-            return hits
+        retriever = state.bm25_index
+        tokens = [t for t in _tokenize_query(query) if t in retriever.vocab_dict]
+        k = min(top_k, len(state.chunk_tokens))
+        if not tokens or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        ids, scores = retriever.retrieve([tokens], k=k, show_progress=False)
+        hits = ids[0][scores[0] > 0]
+        logger.debug("retrieve_sparse for query '%s' returned %d hits.", query, len(hits))
+        return hits
 
     except Exception as e:
         logger.error("BM25 search error for query '%s': %s", query, e, exc_info=True)
-        return []
+        return np.empty(0, dtype=np.int64)
+
+
+def retrieve_sparse(query, top_k=CFG.top_k):
+    """
+    Perform sparse retrieval using BM25 over the indexed document chunks.
+
+    Args:
+        query (str): User input query.
+        top_k (int, optional): Number of top results to retrieve. Defaults to `CFG.top_k`.
+
+    Returns:
+        List[Tuple[str, str]]: A list of tuples containing matched text chunks
+                               and their sources (file name and page). Returns an empty list
+                               on error or if index is unavailable.
+    """
+    idxs = search_sparse(query, top_k)
+    return list(zip((state.all_chunks[i] for i in idxs), state.chunk_sources(idxs)))
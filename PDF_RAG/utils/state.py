@@ -1,14 +1,42 @@
-from config import MAX_EXCHANGES
+import numpy as np
+from config import CFG
 
 class State:
     def __init__(self):
         self.processed_documents = {}
         self.all_chunks         = []
-        self.chunk_to_doc_map   = {}
+        self.doc_hashes         = []                         # Document hash per doc id
+        self.doc_names          = []                         # File name per doc id
+        self.chunk_doc_ids      = np.empty(0, dtype=np.int32)  # Doc id per chunk; valid up to len(all_chunks)
+        self.chunk_pages        = np.empty(0, dtype=np.int32)  # Page index per chunk; same length as chunk_doc_ids
         self.vectorizer         = None
+        self.chunk_counts       = None
         self.chunk_embeddings   = None
+        self.dense_index        = None
+        self.chunk_tokens       = []
         self.bm25_index         = None
+        self.keyterm_postings   = {}                         # Lowercased key term -> ascending ids of chunks containing it
+        self.index_version      = 0
         self.kg                 = None
-        self.max_chat_history   = MAX_EXCHANGES
+        self.kg_subject_to_labels = {}
+        self.max_chat_history   = CFG.max_exchanges
+
+    def chunk_sources(self, chunk_ids):
+        """
+        Describe where each of the given chunks comes from, e.g. "paper.pdf, page 3".
+
+        Document ids and page numbers are gathered for all ids with one fancy-index operation
+        per array; names are then looked up per hit, since only a handful are requested.
+
+        Args:
+            chunk_ids (np.ndarray): Indices into `all_chunks`.
+
+        Returns:
+            List[str]: Source description of each chunk, in the same order.
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        doc_ids = self.chunk_doc_ids[chunk_ids].tolist()
+        pages = (self.chunk_pages[chunk_ids] + 1).tolist()
+        return [f"{self.doc_names[d]}, page {page}" for d, page in zip(doc_ids, pages)]
 
 state = State()